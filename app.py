@@ -1,14 +1,29 @@
 # app.py
+import bisect
+import csv
+import json
 import os
 import tempfile
+import threading
+from pathlib import Path
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
 import streamlit as st
 
 st.set_page_config(page_title="Company Lookup", page_icon="🔎", layout="centered")
 
 # --- Configuration ---
 CSV_PATH = "companies.csv"        # Path to your CSV file
+# Append-only log of edited cells, replayed on top of CSV_PATH and folded into it on compaction.
+# It is local, uncompacted state (git-ignored); it records the CSV's size/mtime and is refused
+# if CSV_PATH is replaced underneath it, since row ids would no longer line up.
+EDIT_LOG_PATH = "companies.edits.jsonl"
+COMPACT_RATIO = 0.10              # Fold the log into the CSV once it exceeds this fraction of the CSV size
 SEARCH_COL_NAME = "Company"       # Column to search against (case-insensitive)
+SEARCH_NORM_COL = "_search_norm"  # Internal column: stripped + casefolded search values
 
 # Columns to display / edit (and their order)
 DESIRED_COLS = [
@@ -16,23 +31,234 @@ DESIRED_COLS = [
     "state", "zip", "Sq Ft", "Industry", "Notes", "Operator", "Utility"
 ]
 
+# Low-cardinality columns stored as pandas categoricals (one copy per distinct value)
+CATEGORICAL_COLS = ["CLASS", "state", "Industry", "Operator", "Utility"]
+
 # --- Utilities ---
+def fsync_dir(dirpath: str) -> None:
+    """
+    Flush a directory's entries (e.g. a rename into it) to disk.
+    No-op on platforms where directories can't be opened (Windows).
+    """
+    if os.name != "posix":
+        return
+    dfd = os.open(dirpath, os.O_RDONLY)
+    try:
+        os.fsync(dfd)
+    finally:
+        os.close(dfd)
+
 def atomic_write_csv(path: str, df: pd.DataFrame) -> None:
     """
-    Write CSV atomically to reduce the chance of a partially-written file.
+    Write CSV atomically and durably: write temp file, fsync it, rename over path, fsync the directory.
     """
     dirpath = os.path.dirname(os.path.abspath(path)) or "."
     fd, tmp_path = tempfile.mkstemp(prefix="tmp-", suffix=".csv", dir=dirpath)
     os.close(fd)
     try:
-        df.to_csv(tmp_path, index=False)
+        # 1 MiB buffer: far fewer write syscalls than the 8 KiB default on a multi-MB CSV
+        with open(tmp_path, "w", buffering=1 << 20, newline="", encoding="utf-8") as f:
+            df.to_csv(f, index=False)
+            f.flush()
+            os.fsync(f.fileno())  # data must be on disk before the rename can expose it
         os.replace(tmp_path, path)  # atomic on same filesystem
+        fsync_dir(dirpath)  # make the rename itself survive a crash
     finally:
-        if os.path.exists(tmp_path):
+        try:
+            Path(tmp_path).unlink(missing_ok=True)  # already gone after a successful replace
+        except Exception:
+            pass
+
+def drop_internal_cols(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Return the DataFrame without internal helper columns (for display / export / writes).
+    """
+    return df.drop(columns=[SEARCH_NORM_COL], errors="ignore")
+
+def csv_signature(path: str) -> dict:
+    """
+    Size and mtime of the base CSV, recorded in the edit log to detect a replaced file.
+    """
+    info = os.stat(path)
+    return {"size": info.st_size, "mtime_ns": info.st_mtime_ns}
+
+def check_base(path: str, base: dict) -> None:
+    """
+    Raise ValueError if the CSV on disk is no longer the one with signature base.
+    """
+    if csv_signature(path) != base:
+        raise ValueError(
+            f"'{path}' changed on disk since it was loaded, so row ids may no longer match. "
+            "Reload the page and re-enter your changes."
+        )
+
+def repair_edit_log(log_path: str, base: dict) -> None:
+    """
+    Make the log safe to append to after an interrupted write.
+    A torn last line is cut off (otherwise the next append would be glued onto it),
+    and a log whose header line is unreadable is rewritten under a fresh header for base.
+    """
+    if not os.path.exists(log_path) or os.path.getsize(log_path) == 0:
+        return
+    with open(log_path, "rb+") as f:
+        f.seek(-1, os.SEEK_END)
+        if f.read(1) != b"\n":
+            f.seek(0)
+            f.truncate(f.read().rfind(b"\n") + 1)
+            f.flush()
+            os.fsync(f.fileno())
+        f.seek(0)
+        first = f.readline()
+    if not first:
+        return  # only a torn header was left; append_edit starts the log over
+    try:
+        if "base" in json.loads(first):
+            return
+    except json.JSONDecodeError:
+        pass
+    # Keep every readable entry under a new header; replace atomically so a crash here loses nothing
+    with open(log_path, encoding="utf-8", errors="replace") as f:
+        entries = []
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if "base" not in entry:
+                entries.append(entry)
+    dirpath = os.path.dirname(os.path.abspath(log_path)) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix="tmp-", suffix=".jsonl", dir=dirpath)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"base": base}) + "\n")
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, log_path)
+        fsync_dir(dirpath)
+    finally:
+        Path(tmp_path).unlink(missing_ok=True)
+
+def append_edit(path: str, log_path: str, base: dict, idx: int, row: dict) -> None:
+    """
+    Append one row's edited cells to the edit log and fsync it.
+    A save costs one short line on disk instead of a full CSV rewrite.
+    base is the signature of the CSV the row ids came from; a new log starts with it as a header line.
+    """
+    check_base(path, base)
+    repair_edit_log(log_path, base)
+    lines = json.dumps({"idx": int(idx), "row": row}) + "\n"
+    if not os.path.exists(log_path) or os.path.getsize(log_path) == 0:
+        lines = json.dumps({"base": base}) + "\n" + lines
+    fd = os.open(log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, lines.encode("utf-8"))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def apply_edit_log(df: pd.DataFrame, path: str, log_path: str) -> pd.DataFrame:
+    """
+    Replay the edit log on top of the base CSV (later entries win).
+    Entries for unknown row ids or columns create them, so replaying is idempotent.
+    Raises ValueError if the log was written against a different version of the CSV.
+    """
+    if not os.path.exists(log_path):
+        return df
+    with open(log_path, encoding="utf-8") as f:
+        base = None
+        for line in f:
             try:
-                os.remove(tmp_path)
-            except Exception:
-                pass
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn last line from an interrupted append
+            if "base" in entry:
+                base = entry["base"]
+                continue
+            if base != csv_signature(path):
+                raise ValueError(
+                    f"'{path}' changed on disk after the edits in '{log_path}' were saved, "
+                    "so their row ids may no longer match. Re-apply or discard that log manually."
+                )
+            row = entry["row"]
+            df.loc[entry["idx"], list(row)] = list(row.values())
+    return df.fillna("")
+
+def read_companies(path: str, log_path: str) -> pd.DataFrame:
+    """
+    Read the base CSV and apply any pending edits from the log.
+    """
+    # Read the header first so every column can be forced to string (no type inference)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        header = next(csv.reader(f), [])
+    # PyArrow's CSV reader parses straight into Arrow string buffers (several times faster than pd.read_csv);
+    # Arrow-backed strings use about half the memory of object dtype and .str ops run as Arrow kernels.
+    # It is stricter than pandas, so blank/duplicate headers and ragged rows go through pd.read_csv instead.
+    df = None
+    if all(header) and len(set(header)) == len(header):
+        try:
+            table = pacsv.read_csv(
+                path,
+                parse_options=pacsv.ParseOptions(newlines_in_values=True),
+                convert_options=pacsv.ConvertOptions(
+                    column_types={c: pa.string() for c in header},
+                    strings_can_be_null=False,
+                ),
+            )
+            df = table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+        except pa.ArrowInvalid:
+            pass
+    if df is None:
+        df = pd.read_csv(path, dtype="string[pyarrow]", keep_default_na=False).fillna("")
+    return apply_edit_log(df, path, log_path)
+
+def save_full_csv(path: str, log_path: str, df: pd.DataFrame) -> None:
+    """
+    Rewrite the whole CSV from df (which must already include logged edits), then drop the log.
+    """
+    atomic_write_csv(path, drop_internal_cols(df))
+    Path(log_path).unlink(missing_ok=True)
+
+def maybe_compact_edit_log(path: str, log_path: str) -> bool:
+    """
+    Fold the edit log into the CSV once it has grown past COMPACT_RATIO of the CSV size.
+    Returns True if it did (the CSV's signature changes, so loaded data must be reloaded).
+    """
+    if not os.path.exists(log_path) or os.path.getsize(log_path) <= COMPACT_RATIO * os.path.getsize(path):
+        return False
+    save_full_csv(path, log_path, read_companies(path, log_path))
+    return True
+
+class EditWriter:
+    """
+    Serializes all writes to the CSV and its edit log (appends, compaction, full rewrites)
+    across sessions. Writes are synchronous, so a failure surfaces in the handler that caused it.
+    """
+    def __init__(self, path: str, log_path: str, lock: threading.RLock):
+        self.path = path
+        self.log_path = log_path
+        self.lock = lock
+
+    def append(self, base: dict, idx, row: dict) -> None:
+        """
+        Log an edit made against the CSV with signature base (ValueError if it has since changed).
+        """
+        with self.lock:
+            append_edit(self.path, self.log_path, base, idx, row)
+
+    def compact(self) -> bool:
+        with self.lock:
+            return maybe_compact_edit_log(self.path, self.log_path)
+
+    def rewrite(self, base: dict, df: pd.DataFrame) -> None:
+        """
+        Replace the CSV with df (which must include every logged edit) and drop the log.
+        Raises ValueError if the CSV is no longer the one with signature base.
+        """
+        with self.lock:
+            check_base(self.path, base)
+            save_full_csv(self.path, self.log_path, df)
 
 def ensure_columns(df: pd.DataFrame, want_display_cols: list, col_map: dict) -> tuple[pd.DataFrame, dict]:
     """
@@ -47,24 +273,77 @@ def ensure_columns(df: pd.DataFrame, want_display_cols: list, col_map: dict) ->
             col_map[display.lower()] = display
     return df, col_map
 
+def set_row(df: pd.DataFrame, idx, row: dict) -> None:
+    """
+    Assign several cells of one row in a single .loc call,
+    adding new values to categorical columns' categories first.
+    """
+    for col, val in row.items():
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and val not in df[col].cat.categories:
+            df[col] = df[col].cat.add_categories([val])
+    df.loc[idx, list(row)] = list(row.values())
+
+def update_row(df: pd.DataFrame, exact_index: dict, idx, row: dict, search_col: str) -> None:
+    """
+    Apply an edit to the loaded frame in place, keeping the normalized search column
+    and the exact-match index in sync. All columns in row must already exist.
+    """
+    old_key = df.at[idx, SEARCH_NORM_COL]
+    set_row(df, idx, row)
+    new_key = str(df.at[idx, search_col]).strip().casefold()
+    if new_key != old_key:
+        df.at[idx, SEARCH_NORM_COL] = new_key
+        exact_index[old_key].remove(idx)
+        if not exact_index[old_key]:
+            del exact_index[old_key]
+        bisect.insort(exact_index.setdefault(new_key, []), idx)
+
 # --- Data Loading & Column Resolution ---
-@st.cache_data(show_spinner=False)
+# Cached by reference, so reruns don't pickle/copy the DataFrame.
+# Treat the returned objects as read-only and .copy() before mutating;
+# the only exception is the edit path, which updates them in place via update_row.
+# Sessions run on separate threads: hold DATA_LOCK while reading from or patching the shared objects.
+@st.cache_resource(show_spinner=False)
+def get_data_lock() -> threading.RLock:
+    return threading.RLock()
+
+@st.cache_resource(show_spinner=False)
 def load_data(path: str):
     try:
-        df = pd.read_csv(path, dtype=str).fillna("")
+        # Signature of the CSV this frame's row ids refer to; writes are refused once it changes
+        base = csv_signature(path)
+        # A log left torn by a crash (e.g. an unreadable header) would otherwise keep the app from loading
+        repair_edit_log(EDIT_LOG_PATH, base)
+        df = read_companies(path, EDIT_LOG_PATH)
     except FileNotFoundError:
         st.error(f"CSV not found at '{path}'. Update CSV_PATH or place the file there.")
         st.stop()
+    except ValueError as e:
+        st.error(f"Could not load '{path}': {e}")
+        st.stop()
 
     # Map lowercased names -> actual column names (for case-insensitive matching)
     col_map = {c.lower(): c for c in df.columns}
 
+    for name in CATEGORICAL_COLS:
+        if name.lower() in col_map:
+            actual = col_map[name.lower()]
+            df[actual] = df[actual].astype("category")
+
     # Resolve search column
     if SEARCH_COL_NAME.lower() not in col_map:
         st.error(f"Could not find the '{SEARCH_COL_NAME}' column in the CSV.")
         st.stop()
     search_col_actual = col_map[SEARCH_COL_NAME.lower()]
 
+    # Normalize the search column once so each rerun only compares against it
+    df[SEARCH_NORM_COL] = df[search_col_actual].str.strip().str.casefold()
+
+    # Hash index: normalized name -> row labels (Exact search becomes a dict lookup)
+    exact_index = {}
+    for idx, key in zip(df.index, df[SEARCH_NORM_COL].to_numpy()):
+        exact_index.setdefault(key, []).append(idx)
+
     # Resolve desired columns (case-insensitive), but display with the exact names from DESIRED_COLS
     resolved_cols = []
     rename_map = {}
@@ -82,17 +361,28 @@ def load_data(path: str):
     # Also build a display->actual map (for editing)
     display_to_actual = {d: col_map.get(d.lower(), d) for d in DESIRED_COLS}
 
-    return df, search_col_actual, resolved_cols, rename_map, missing, col_map, display_to_actual
+    return df, search_col_actual, resolved_cols, rename_map, missing, col_map, display_to_actual, exact_index, base
 
-df, SEARCH_COL, RESOLVED_COLS, RENAME_MAP, MISSING, COL_MAP, DISPLAY_TO_ACTUAL = load_data(CSV_PATH)
+# One writer per process, shared by all sessions (and holding the same lock as the cached data)
+@st.cache_resource(show_spinner=False)
+def get_edit_writer(path: str, log_path: str) -> EditWriter:
+    return EditWriter(path, log_path, get_data_lock())
+
+DATA_LOCK = get_data_lock()
+# A cold load reads the CSV + log, so it must not overlap another session's compaction or rewrite
+with DATA_LOCK:
+    df, SEARCH_COL, RESOLVED_COLS, RENAME_MAP, MISSING, COL_MAP, DISPLAY_TO_ACTUAL, EXACT_INDEX, _ = load_data(CSV_PATH)
+edit_writer = get_edit_writer(CSV_PATH, EDIT_LOG_PATH)
 
 # --- Header / Export ---
 st.title("🔎 Company Lookup (CSV)")
 
 # Download the ENTIRE backend CSV (current contents on disk)
+with DATA_LOCK:
+    full_csv = drop_internal_cols(df).to_csv(index=False).encode("utf-8")
 st.download_button(
     label="⬇️ Download full CSV",
-    data=df.to_csv(index=False).encode("utf-8"),
+    data=full_csv,
     file_name="companies_export.csv",
     mime="text/csv",
     help="Exports the entire backend CSV as it exists right now."
@@ -118,36 +408,40 @@ if not query:
     st.stop()
 
 q = query.strip()
-if mode == "Exact":
-    mask = df[SEARCH_COL].str.strip().str.casefold() == q.casefold()
-else:
-    mask = df[SEARCH_COL].str.contains(q, case=False, na=False)
-
-results = df.loc[mask]
+q_norm = q.casefold()
+# 'results' is a copy, so everything below reads it rather than the shared frame
+with DATA_LOCK:
+    if mode == "Exact":
+        # Misses (common while typing) skip the label lookup entirely
+        hits = EXACT_INDEX.get(q_norm)
+        results = df.loc[hits] if hits else df.iloc[:0]
+    else:
+        # Substring scan directly on the column's Arrow buffer, then a positional take
+        hits = pc.match_substring(pa.array(df[SEARCH_NORM_COL]), q_norm)
+        results = df.iloc[np.flatnonzero(hits.to_numpy(zero_copy_only=False))]
 
 # Prepare a view limited to desired columns (for display)
 view = (
     results[RESOLVED_COLS].rename(columns=RENAME_MAP)
-    if RESOLVED_COLS else results
+    if RESOLVED_COLS else drop_internal_cols(results)
 )
 
-def label_for_dropdown(idx: int) -> str:
-    # Prefer the cleaned/renamed 'view' (has display names)
-    row = (view.loc[idx] if idx in view.index else results.loc[idx])
-    def g(r, *names):
+def dropdown_labels(frame: pd.DataFrame) -> dict:
+    """
+    Build "Address City state Industry" labels for all rows at once (blank parts skipped),
+    falling back to the company name. Returns {row id: label}.
+    """
+    def g(*names):
         for n in names:
-            if n in r.index:
-                return str(r.get(n, "")).strip()
-        return ""
-    addr = g(row, "Address", "address")
-    city = g(row, "City", "city")
-    state = g(row, "state", "State")
-    industry = g(row, "Industry", "industry")
-    label = " ".join(x for x in [addr, city, state, industry] if x)
-    if not label:
-        # Fallback to company name or row id
-        label = g(row, "Company", SEARCH_COL) or f"Row {idx}"
-    return label
+            if n in frame.columns:
+                return frame[n].astype(str).str.strip()
+        return pd.Series("", index=frame.index, dtype=object)
+    label = pd.Series("", index=frame.index, dtype=object)
+    for part in (g("Address", "address"), g("City", "city"), g("state", "State"), g("Industry", "industry")):
+        label = label + part.where(part == "", " " + part)
+    label = label.str.lstrip()
+    label = label.where(label != "", g("Company", SEARCH_COL))
+    return label.to_dict()
 
 # --- Results / Selection ---
 if results.empty:
@@ -159,10 +453,12 @@ else:
     else:
         st.success(f"{len(results)} matches found")
         idx_options = list(results.index)
+        # Prefer the cleaned/renamed 'view' (has display names)
+        labels = dropdown_labels(view)
         chosen_idx = st.selectbox(
             "Choose a facility",
             options=idx_options,
-            format_func=label_for_dropdown,
+            format_func=lambda idx: labels.get(idx) or f"Row {idx}",
             index=0
         )
 
@@ -180,23 +476,21 @@ else:
         # Build a safe filename based on the selected company's name when available
         selected_company = ""
         try:
-            selected_company = str(df.loc[chosen_idx, COL_MAP.get(SEARCH_COL_NAME.lower(), SEARCH_COL)]).strip()
+            selected_company = str(results.loc[chosen_idx, COL_MAP.get(SEARCH_COL_NAME.lower(), SEARCH_COL)]).strip()
         except Exception:
             selected_company = "record"
         safe_name = "".join(c if c.isalnum() or c in ("-", "_") else "_" for c in (selected_company or "record")) or "record"
         st.download_button(
             label="⬇️ Download selected record CSV",
-            data=df.loc[[chosen_idx]].to_csv(index=False).encode("utf-8"),
+            data=drop_internal_cols(results.loc[[chosen_idx]]).to_csv(index=False).encode("utf-8"),
             file_name=f"company_{safe_name}.csv",
             mime="text/csv",
             help="Exports only the selected record as a one-row CSV."
         )
 
     # Show chosen record (pretty key/value)
-    chosen_display = (
-        df.loc[[chosen_idx], RESOLVED_COLS].rename(columns=RENAME_MAP)
-        if RESOLVED_COLS else df.loc[[chosen_idx]]
-    )
+    # 'view' already holds the chosen row with display columns / names
+    chosen_display = view.loc[[chosen_idx]]
     st.subheader("Selected facility")
     st.table(chosen_display.reset_index(drop=True).T.rename(columns={0: "Value"}))
 
@@ -208,41 +502,54 @@ else:
         for display_name in DESIRED_COLS:
             actual_col = DISPLAY_TO_ACTUAL.get(display_name, display_name)
             current_val = ""
-            if actual_col in df.columns:
-                current_val = str(df.loc[chosen_idx, actual_col])
+            if actual_col in results.columns:
+                current_val = str(results.loc[chosen_idx, actual_col])
             # Use text_input for all to preserve exact CSV content
             inputs[display_name] = st.text_input(display_name, value=current_val)
 
         save_edit = st.form_submit_button("Save changes")
         if save_edit:
-            # Clear cache and reload fresh to avoid stale writes
-            st.cache_data.clear()
-            df_fresh, _, _, _, _, col_map_fresh, _ = load_data(CSV_PATH)
-
-            # Ensure all desired columns exist before writing
-            df_fresh, col_map_fresh = ensure_columns(df_fresh, DESIRED_COLS, col_map_fresh)
-
-            # Compute display->actual on the fresh map
-            display_to_actual_fresh = {d: col_map_fresh.get(d.lower(), d) for d in DESIRED_COLS}
-
-            # If chosen index no longer exists (edge case), stop
-            if chosen_idx not in df_fresh.index:
-                st.error("Record no longer exists or CSV changed. Please search again.")
-                st.stop()
-
-            # Apply updates
-            for display_name, new_val in inputs.items():
-                actual_col = display_to_actual_fresh[display_name]
-                if actual_col not in df_fresh.columns:
-                    df_fresh[actual_col] = ""
-                df_fresh.loc[chosen_idx, actual_col] = new_val
-
-            # Write atomically
-            atomic_write_csv(CSV_PATH, df_fresh)
-
-            st.success("Saved changes to CSV.")
-            st.cache_data.clear()
-            st.rerun()
+            with DATA_LOCK:
+                # Re-fetch under the lock: another session may have reloaded the data since this run started
+                live_df, _, _, _, _, live_col_map, _, live_index, live_base = load_data(CSV_PATH)
+
+                # Log only the changed cells (columns missing from the CSV are created when the log is replayed).
+                # Repeated saves of the same values (e.g. a double click) therefore write nothing.
+                row = {}
+                for display_name, new_val in inputs.items():
+                    actual_col = live_col_map.get(display_name.lower(), display_name)
+                    if actual_col not in live_df.columns or str(live_df.loc[chosen_idx, actual_col]) != new_val:
+                        row[actual_col] = new_val
+
+                if row:
+                    try:
+                        edit_writer.append(live_base, chosen_idx, row)
+                    except ValueError as e:
+                        load_data.clear()
+                        st.error(f"Changes not saved: {e}")
+                        st.stop()
+
+                    if all(col in live_df.columns for col in row):
+                        # Patch the cached frame in place instead of re-parsing the whole CSV
+                        update_row(live_df, live_index, chosen_idx, row, SEARCH_COL)
+                    else:
+                        # A column was missing from the CSV: reload so column resolution picks it up
+                        load_data.clear()
+
+                    # The edit is already durable in the log, so a failed compaction only needs reporting
+                    try:
+                        if edit_writer.compact():
+                            load_data.clear()  # the CSV was rewritten, so the cached signature is stale
+                    except ValueError as e:
+                        load_data.clear()
+                        st.error(f"Saved changes to the edit log, but could not fold it into '{CSV_PATH}': {e}")
+                        st.stop()
+
+            if not row:
+                st.info("No changes to save.")
+            else:
+                st.success("Saved changes to CSV.")
+                st.rerun()
 
 # --- Add New Record ---
 st.markdown("---")
@@ -258,31 +565,39 @@ with st.form("create_form"):
     create = st.form_submit_button("Create facility")
 
     if create:
-        st.cache_data.clear()
-        df_fresh, search_col_fresh, _, _, _, col_map_fresh, _ = load_data(CSV_PATH)
-
-        # Ensure columns exist
-        df_fresh, col_map_fresh = ensure_columns(df_fresh, DESIRED_COLS, col_map_fresh)
-        display_to_actual_fresh = {d: col_map_fresh.get(d.lower(), d) for d in DESIRED_COLS}
-
-        # Uniqueness check (optional)
         new_company = (create_inputs.get("Company") or "").strip()
-        if enforce_unique and new_company:
-            dup_mask = df_fresh[search_col_fresh].str.strip().str.casefold() == new_company.casefold()
-            if dup_mask.any():
+        # Hold the lock from copy to rewrite so no other session's edit lands in between and is dropped with the log
+        with DATA_LOCK:
+            # Re-fetch under the lock: another session may have reloaded the data since this run started
+            live_df, _, _, _, _, live_col_map, _, live_index, live_base = load_data(CSV_PATH)
+
+            # Uniqueness check (optional): a probe of the normalized-name index, no column scan
+            if enforce_unique and new_company and new_company.casefold() in live_index:
                 st.error("A record with that Company already exists. Disable the checkbox to allow duplicates.")
                 st.stop()
 
-        # Build new row with all columns in df_fresh (preserve other, non-DESIRED columns as blanks)
-        new_row = {col: "" for col in df_fresh.columns}
-        for display_name, val in create_inputs.items():
-            actual_col = display_to_actual_fresh[display_name]
-            new_row[actual_col] = val
+            # The cached frame is current (edits patch it in place), so build on it instead of re-parsing the CSV.
+            # Ensure columns exist (on a copy: the cached frame is shared)
+            df_new, col_map_new = ensure_columns(live_df.copy(), DESIRED_COLS, dict(live_col_map))
+            display_to_actual_new = {d: col_map_new.get(d.lower(), d) for d in DESIRED_COLS}
+
+            # Build new row with all columns in df_new (preserve other, non-DESIRED columns as blanks)
+            new_row = {col: "" for col in df_new.columns}
+            for display_name, val in create_inputs.items():
+                actual_col = display_to_actual_new[display_name]
+                new_row[actual_col] = val
 
-        df_fresh = pd.concat([df_fresh, pd.DataFrame([new_row])], ignore_index=True)
+            # pandas has no in-place row append (.loc enlargement is a concat too), and this runs once per create
+            df_new = pd.concat([df_new, pd.DataFrame([new_row])], ignore_index=True)
 
-        atomic_write_csv(CSV_PATH, df_fresh)
+            # df_new already includes logged edits, so this rewrite also compacts the log
+            try:
+                edit_writer.rewrite(live_base, df_new)
+            except ValueError as e:
+                load_data.clear()
+                st.error(f"Record not added: {e}")
+                st.stop()
+            load_data.clear()
 
         st.success("New record added to CSV.")
-        st.cache_data.clear()
         st.rerun()